@@ -53,33 +53,39 @@ class VariableAlreadyDefinedError(VariableError):
     ) -> None:
         self.old_var = old_var
         self.new_var = new_var
+        self._message = f"create: {new_var.source} cannot define var.{new_var.name} because {old_var.source} already defined it"
 
     def __str__(self) -> str:
-        return f"create: {self.new_var.source} cannot define var.{self.new_var.name} because {self.old_var.source} already defined it"
+        return self._message
 
 
 class VariableNotConsistentError(VariableError):
     def __init__(self, old_var: "VariableValue", new_var: "VariableValue") -> None:
         self.old_var = old_var
         self.new_var = new_var
+        self._message = f"create: {new_var.source} cannot set var.{new_var.name}={repr(new_var.value)} because {old_var.source} set var.{old_var.name}={repr(old_var.value)}"
 
     def __str__(self) -> str:
-        return f"create: {self.new_var.source} cannot set var.{self.new_var.name}={repr(self.new_var.value)} because {self.old_var.source} set var.{self.old_var.name}={repr(self.old_var.value)}"
+        return self._message
 
 
 class VariableNotDefinedError(VariableError):
     def __init__(self, name: str, consumer: Any):
         self.name = name
         self.consumer = consumer
+        self._message = f"create: {consumer} cannot access var.{name} because it has not been defined"
 
     def __str__(self) -> str:
-        return f"create: {self.consumer} cannot access var.{self.name} because it has not been defined"
+        return self._message
 
 
 class VariableNotPopulatedError(VariableError):
     def __init__(self, name: str, consumer: Any):
         self.name = name
         self.consumer = consumer
+        self._message = (
+            f"create: {consumer} cannot access var.{name} because it has no value"
+        )
 
     def __str__(self) -> str:
-        return f"create: {self.consumer} cannot access var.{self.name} because it has no value"
+        return self._message
@@ -3,8 +3,6 @@ import sys
 from pathlib import Path
 from typing import Generator, List
 
-import hcl2
-
 from . import log
 
 
@@ -31,6 +29,11 @@ def parse_environment_variable_for_variables(name: str, value: str) -> dict:
 
 
 def parse_hcl2(contents: str) -> dict:
+
+    # Imported here because it is slow to import
+    # and not needed by every Pretf command.
+    import hcl2
+
     try:
         return hcl2.loads(contents)
     except Exception as error:
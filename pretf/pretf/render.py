@@ -6,8 +6,6 @@ from pathlib import Path, PurePath
 from threading import Thread
 from typing import Any, Callable, Dict, Generator, List, Optional, Union
 
-import jinja2
-
 from . import log
 from .blocks import Block, Interpolated
 from .exceptions import FunctionNotFoundError
@@ -67,9 +65,14 @@ def render_files(
             )
         else:
             raise ValueError(source_path)
-        thread.start()
         threads.append(thread)
 
+    # Files are rendered in separate threads, even when there is only
+    # one, because KeyboardInterrupt is only raised in the main thread.
+    # Rendering is not interrupted part way through, and any threads
+    # waiting for variables are unblocked so they can finish.
+    for thread in threads:
+        thread.start()
     for thread in threads:
         try:
             thread.join()
@@ -148,6 +151,10 @@ class RenderThread(Thread):
 class RenderJinjaThread(RenderThread):
     def render(self) -> Generator[dict, None, None]:
 
+        # Imported here because it is slow to import
+        # and most projects do not use Jinja2 templates.
+        import jinja2
+
         template_string = self.source_path.read_text()
         template = jinja2.Template(template_string)
         rendered = template.render(
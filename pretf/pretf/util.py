@@ -1,21 +1,26 @@
 import os
+import posixpath
+import re
 import shlex
 import sys
+from codecs import IncrementalDecoder, getincrementaldecoder
 from contextlib import contextmanager
-from fnmatch import fnmatch
-from importlib.abc import Loader
-from importlib.machinery import ModuleSpec
-from importlib.util import module_from_spec, spec_from_file_location
-from io import StringIO
+from fnmatch import translate
+from functools import lru_cache
 from pathlib import Path, PurePath
+from selectors import EVENT_READ, DefaultSelector
 from subprocess import PIPE, CalledProcessError, CompletedProcess, Popen
-from threading import Thread
+from threading import Event, Lock, Thread
 from types import ModuleType
 from typing import (
     IO,
-    BinaryIO,
+    Any,
+    Callable,
+    Dict,
     Generator,
+    Iterable,
     List,
+    NamedTuple,
     Optional,
     Sequence,
     TextIO,
@@ -52,17 +57,23 @@ def execute(
     if env is None:
         env = os.environ.copy()
 
+    cmd = " ".join(shlex.quote(arg) for arg in args)
+
     if is_verbose(verbose):
-        log.ok(f"run: {' '.join(shlex.quote(arg) for arg in args)}")
+        log.ok(f"run: {cmd}")
 
     if capture:
-        return _execute_and_capture(file, args, cwd, env, verbose)
+        return _execute_and_capture(file, args, cmd, cwd, env, verbose)
     else:
-        return _execute(file, args, cwd, env)
+        return _execute(file, args, cmd, cwd, env)
 
 
 def _execute(
-    file: str, args: Sequence[str], cwd: Optional[Union[Path, str]], env: dict
+    file: str,
+    args: Sequence[str],
+    cmd: str,
+    cwd: Optional[Union[Path, str]],
+    env: dict,
 ) -> CompletedProcess:
 
     proc = Popen(args, executable=file, cwd=cwd, env=env)
@@ -76,10 +87,7 @@ def _execute(
             break
 
     if returncode != 0:
-        raise CalledProcessError(
-            returncode=returncode,
-            cmd=" ".join(shlex.quote(arg) for arg in args),
-        )
+        raise CalledProcessError(returncode=returncode, cmd=cmd)
 
     return CompletedProcess(args=args, returncode=returncode)
 
@@ -87,64 +95,186 @@ def _execute(
 def _execute_and_capture(
     file: str,
     args: Sequence[str],
+    cmd: str,
     cwd: Optional[Union[Path, str]],
     env: dict,
     verbose: Optional[bool],
 ) -> CompletedProcess:
 
-    stdout_buffer = StringIO()
-    stderr_buffer = StringIO()
-
-    proc = Popen(args, executable=file, stdout=PIPE, stderr=PIPE, cwd=cwd, env=env)
+    stdout_chunks: List[str] = []
+    stderr_chunks: List[str] = []
 
-    stdout_args: List[Optional[IO]] = [proc.stdout, stdout_buffer]
+    stdout_streams: List[TextIO] = []
     if is_verbose(verbose):
-        stdout_args.append(sys.stdout)
-    stdout_thread = Thread(target=_fan_out, args=stdout_args)
-    stdout_thread.start()
-
-    stderr_args = [proc.stderr, stderr_buffer, sys.stderr]
-    stderr_thread = Thread(target=_fan_out, args=stderr_args)
-    stderr_thread.start()
-
-    while True:
-        try:
-            returncode = proc.wait()
-        except KeyboardInterrupt:
-            pass
-        else:
-            break
+        stdout_streams.append(sys.stdout)
+    stderr_streams: List[TextIO] = [sys.stderr]
+
+    # Read the pipes in other threads. KeyboardInterrupt is only raised
+    # in the main thread, so reading is never interrupted part way through
+    # a chunk. The subprocess receives the signal too and decides what to
+    # do, while its output continues to be read. The readers are started
+    # before the subprocess so that everything after starting the
+    # subprocess can be retried when it is interrupted.
+    if sys.platform == "win32":
+        # Pipes cannot be used with select() on Windows,
+        # so use a thread to read from each pipe instead.
+        readers = [_PipeReader(_fan_out), _PipeReader(_fan_out)]
+    else:
+        readers = [_PipeReader(_fan_out_select)]
 
-    stdout_thread.join()
-    stderr_thread.join()
+    proc: Optional[Popen] = None
+    try:
+        for reader in readers:
+            reader.start()
+        while True:
+            try:
+                if proc is None:
+                    proc = Popen(
+                        args,
+                        executable=file,
+                        stdout=PIPE,
+                        stderr=PIPE,
+                        cwd=cwd,
+                        env=env,
+                    )
+                assert proc.stdout and proc.stderr
+                if len(readers) == 2:
+                    readers[0].provide(proc.stdout, stdout_chunks, *stdout_streams)
+                    readers[1].provide(proc.stderr, stderr_chunks, *stderr_streams)
+                else:
+                    readers[0].provide(
+                        {
+                            proc.stdout: (stdout_chunks, stdout_streams),
+                            proc.stderr: (stderr_chunks, stderr_streams),
+                        }
+                    )
+                returncode = proc.wait()
+                for reader in readers:
+                    reader.join()
+            except KeyboardInterrupt:
+                # Give up if the subprocess was not started,
+                # otherwise keep waiting for it to finish.
+                if proc is None:
+                    raise
+            else:
+                break
+    finally:
+        # Stop the readers if the subprocess could not be started.
+        for reader in readers:
+            reader.stop()
 
-    stdout_buffer.seek(0)
-    stderr_buffer.seek(0)
+    stdout = "".join(stdout_chunks)
+    stderr = "".join(stderr_chunks)
 
     if returncode != 0:
         raise CalledProcessError(
             returncode=returncode,
-            cmd=" ".join(shlex.quote(arg) for arg in args),
-            output=stdout_buffer.read(),
-            stderr=stderr_buffer.read(),
+            cmd=cmd,
+            output=stdout,
+            stderr=stderr,
         )
 
     return CompletedProcess(
         args=args,
         returncode=returncode,
-        stdout=stdout_buffer.read(),
-        stderr=stderr_buffer.read(),
+        stdout=stdout,
+        stderr=stderr,
     )
 
 
-def _fan_out(input_steam: BinaryIO, *output_streams: TextIO) -> None:
-    while True:
-        char = input_steam.read(1).decode()
-        if char:
-            for output_stream in output_streams:
-                output_stream.write(char)
-        else:
-            break
+def _fan_out(
+    input_stream: IO[bytes], chunks: List[str], *output_streams: TextIO
+) -> None:
+    decoder = getincrementaldecoder("utf-8")(errors="replace")
+    while _fan_out_chunk(input_stream, decoder, chunks, output_streams):
+        pass
+
+
+def _fan_out_chunk(
+    input_stream: IO[bytes],
+    decoder: IncrementalDecoder,
+    chunks: List[str],
+    output_streams: Sequence[TextIO],
+) -> bool:
+    """
+    Reads whatever output is available, up to a limit, rather than
+    one byte at a time, and writes it to the output streams.
+    The decoded text is also appended to the list of chunks.
+    An incremental decoder is used because multi-byte characters
+    can be split across chunks. Returns False at the end of the input.
+
+    """
+
+    chunk = input_stream.read1(65536)  # type: ignore
+    text = decoder.decode(chunk, final=not chunk)
+    if text:
+        chunks.append(text)
+        for output_stream in output_streams:
+            output_stream.write(text)
+            output_stream.flush()
+    return bool(chunk)
+
+
+def _fan_out_select(fan_out: Dict[IO[bytes], Tuple[List[str], List[TextIO]]]) -> None:
+    """
+    Reads from multiple pipes in one thread until they are all
+    closed, collecting the output of each one in its list of chunks and
+    writing it to its output streams.
+
+    """
+
+    with DefaultSelector() as selector:
+
+        for input_stream, (chunks, output_streams) in fan_out.items():
+            decoder = getincrementaldecoder("utf-8")(errors="replace")
+            selector.register(
+                input_stream, EVENT_READ, (decoder, chunks, output_streams)
+            )
+
+        while selector.get_map():
+            for key, _ in selector.select():
+                decoder, chunks, output_streams = key.data
+                if not _fan_out_chunk(key.fileobj, decoder, chunks, output_streams):  # type: ignore
+                    selector.unregister(key.fileobj)
+
+
+class _PipeReader(Thread):
+    """
+    A thread that waits to be given pipes and then reads from them
+    using the target function. This allows it to be started before
+    the subprocess that creates the pipes.
+
+    """
+
+    def __init__(self, target: Callable[..., None]) -> None:
+        super().__init__(daemon=True)
+        self.read = target
+        self.read_args: Optional[tuple] = None
+        self.ready = Event()
+
+    def provide(self, *args: Any) -> None:
+        """
+        Starts reading with the given arguments. Only the first call
+        has any effect, so this can be retried.
+
+        """
+
+        if self.read_args is None:
+            self.read_args = args
+        self.ready.set()
+
+    def run(self) -> None:
+        self.ready.wait()
+        if self.read_args is not None:
+            self.read(*self.read_args)
+
+    def stop(self) -> None:
+        """
+        Stops the thread if it was never given any pipes.
+
+        """
+
+        self.ready.set()
 
 
 def find_paths(
@@ -158,13 +288,73 @@ def find_paths(
     elif isinstance(cwd, str):
         cwd = Path(cwd)
 
+    # Compile the exclude patterns into a single regex once,
+    # rather than having fnmatch() translate them for every path.
+    if exclude_name_patterns:
+        exclude_match = re.compile(
+            "|".join(
+                f"(?:{translate(os.path.normcase(pattern))})"
+                for pattern in exclude_name_patterns
+            )
+        ).match
+    else:
+        exclude_match = None
+
+    # Like fnmatch.filter(), skip normcase() for each name on POSIX.
+    normcase = None if os.path is posixpath else os.path.normcase
+
     for pattern in path_patterns:
-        for path in cwd.glob(pattern):
-            for exclude_name_pattern in exclude_name_patterns:
-                if fnmatch(path.name, exclude_name_pattern):
-                    break
-            else:
-                yield path
+        paths: Iterable[Path]
+        if _is_name_pattern(pattern):
+            paths = _find_names(pattern, cwd, normcase)
+        else:
+            paths = cwd.glob(pattern)
+        for path in paths:
+            if exclude_match:
+                name = normcase(path.name) if normcase else path.name
+                if exclude_match(name):
+                    continue
+            yield path
+
+
+def _is_name_pattern(pattern: str) -> bool:
+    """
+    Returns True if the pattern only matches names in a single directory.
+
+    """
+
+    if not pattern or pattern in (".", "..") or "**" in pattern:
+        return False
+    for sep in (os.sep, os.altsep, "/"):
+        if sep and sep in pattern:
+            return False
+    return True
+
+
+def _find_names(
+    pattern: str, cwd: Path, normcase: Optional[Callable[[str], str]]
+) -> List[Path]:
+    """
+    Finds paths in a directory with names matching a pattern. This lists
+    the directory once and only creates Path objects for matching names,
+    which is cheaper than Path.glob() for simple patterns.
+
+    """
+
+    if normcase:
+        pattern = normcase(pattern)
+    match = re.compile(translate(pattern)).match
+
+    paths = []
+    try:
+        with os.scandir(cwd) as entries:
+            for entry in entries:
+                name = entry.name
+                if match(normcase(name) if normcase else name):
+                    paths.append(cwd / name)
+    except (FileNotFoundError, NotADirectoryError, PermissionError):
+        pass
+    return paths
 
 
 def find_workflow_path(cwd: Optional[Union[Path, str]] = None) -> Optional[Path]:
@@ -174,13 +364,12 @@ def find_workflow_path(cwd: Optional[Union[Path, str]] = None) -> Optional[Path]
     elif isinstance(cwd, str):
         cwd = Path(cwd)
 
+    # Look for pretf.workflow.py in all parent directories before
+    # falling back to the deprecated pretf.py name. The parents are
+    # only calculated once for both names.
+    dir_paths = (cwd, *cwd.parents)
     for name in ("pretf.workflow.py", "pretf.py"):
-
-        path = cwd / name
-        if path.exists():
-            return path
-
-        for dir_path in path.parents:
+        for dir_path in dir_paths:
             path = dir_path / name
             if path.exists():
                 return path
@@ -188,6 +377,13 @@ def find_workflow_path(cwd: Optional[Union[Path, str]] = None) -> Optional[Path]
     return None
 
 
+# Directories added to sys.path by import_file(), with a count of the
+# imports using each one. Files are imported from multiple threads, so
+# a directory is only removed when the last import using it has finished.
+_sys_path_added: Dict[str, int] = {}
+_sys_path_lock = Lock()
+
+
 @contextmanager
 def import_file(path: Union[PurePath, str]) -> Generator[ModuleType, None, None]:
     """
@@ -197,12 +393,23 @@ def import_file(path: Union[PurePath, str]) -> Generator[ModuleType, None, None]
 
     """
 
+    # Imported here because they are not needed when
+    # Pretf is just passing a command through to Terraform.
+    from importlib.abc import Loader
+    from importlib.machinery import ModuleSpec
+    from importlib.util import module_from_spec, spec_from_file_location
+
     pathdir = os.path.dirname(path)
-    if pathdir in sys.path:
-        added_to_sys_path = False
-    else:
-        sys.path.insert(0, pathdir)
-        added_to_sys_path = True
+    with _sys_path_lock:
+        if pathdir in _sys_path_added:
+            _sys_path_added[pathdir] += 1
+            added_to_sys_path = True
+        elif pathdir in sys.path:
+            added_to_sys_path = False
+        else:
+            sys.path.insert(0, pathdir)
+            _sys_path_added[pathdir] = 1
+            added_to_sys_path = True
     try:
         name = os.path.basename(path).split(".")[0]
         spec = spec_from_file_location(name, str(path))
@@ -218,7 +425,11 @@ def import_file(path: Union[PurePath, str]) -> Generator[ModuleType, None, None]
         yield module
     finally:
         if added_to_sys_path:
-            sys.path.remove(pathdir)
+            with _sys_path_lock:
+                _sys_path_added[pathdir] -= 1
+                if not _sys_path_added[pathdir]:
+                    del _sys_path_added[pathdir]
+                    sys.path.remove(pathdir)
 
 
 def is_verbose(verbose: Optional[bool], default: bool = True) -> bool:
@@ -233,28 +444,68 @@ def is_verbose(verbose: Optional[bool], default: bool = True) -> bool:
         return default
 
 
-def parse_args() -> Tuple[str, List[str]]:
+HELP_FLAGS = frozenset(("-h", "-help", "--help"))
+VERSION_FLAGS = frozenset(("-v", "-version", "--version"))
+JOINED_FLAGS = frozenset(("-out", "-var", "-var-file"))
+
+VAR_OPTION_RE = re.compile(r"-(var|var-file)=(.*)", re.DOTALL)
+
+
+class ParsedArgs(NamedTuple):
+    subcommand: str
+    options: Tuple[str, ...]
+    # Tuples of (option, "var" or "var-file", value).
+    var_options: Tuple[Tuple[str, str, str], ...]
+
+
+@lru_cache(maxsize=None)
+def _parse_args(argv: Tuple[str, ...]) -> ParsedArgs:
 
     subcommand = ""
     options = []
+    var_options = []
 
-    help_flags = set(("-h", "-help", "--help"))
-    version_flags = set(("-v", "-version", "--version"))
-
-    tokens = sys.argv[1:]
-    while tokens:
-        token = tokens.pop(0)
+    tokens = iter(argv)
+    for token in tokens:
 
-        if token in help_flags:
+        if token in HELP_FLAGS:
             subcommand = "help"
-        elif token in version_flags:
+            continue
+        elif token in VERSION_FLAGS:
             subcommand = "version"
-        elif token in ("-out", "-var", "-var-file") and tokens:
-            token = token + "=" + tokens.pop(0)
-            options.append(token)
+            continue
+        elif token in JOINED_FLAGS:
+            value = next(tokens, None)
+            if value is not None:
+                token = token + "=" + value
         elif not subcommand:
             subcommand = token
-        else:
-            options.append(token)
+            continue
+
+        options.append(token)
+
+        match = VAR_OPTION_RE.fullmatch(token)
+        if match:
+            var_options.append((token, match.group(1), match.group(2)))
+
+    return ParsedArgs(
+        subcommand=subcommand,
+        options=tuple(options),
+        var_options=tuple(var_options),
+    )
+
+
+def parse_args() -> Tuple[str, List[str]]:
+    parsed = _parse_args(tuple(sys.argv[1:]))
+    return (parsed.subcommand, list(parsed.options))
+
+
+def parse_var_options() -> Tuple[Tuple[str, str, str], ...]:
+    """
+    Returns the -var and -var-file options from the command line,
+    in the order they were provided, as (option, kind, value) tuples
+    where kind is either "var" or "var-file".
+
+    """
 
-    return (subcommand, options)
+    return _parse_args(tuple(sys.argv[1:])).var_options
@@ -1,9 +1,11 @@
+import copy
 import os
+import re
 import shlex
 from collections import defaultdict
 from pathlib import Path
 from threading import Event, Lock
-from typing import Any, Dict, Generator, List, Set, Union
+from typing import Any, Dict, Generator, List, Optional, Set, Tuple, Union
 
 from . import log, util
 from .exceptions import (
@@ -18,6 +20,11 @@ from .parser import (
     parse_json_file_for_blocks,
 )
 
+DEFAULT_TFVARS_FILE_NAMES = frozenset(("terraform.tfvars", "terraform.tfvars.json"))
+
+# Matches *.auto.tfvars, *.auto.tfvars.json, *.tf and *.tf.json file names.
+VARIABLES_FILE_SUFFIX_RE = re.compile(r"\.(auto\.tfvars|tf)(?:\.json)?\Z")
+
 
 class VariableProxy:
     def __init__(self, store: "VariableStore", consumer: Any):
@@ -41,13 +48,12 @@ class VariableStore:
         self._values: dict = {}
 
     def __contains__(self, name: str) -> bool:
-        if name in self._definitions:
-            if name in self._values:
-                return True
-            if self._allow_defaults:
-                if self._definitions[name].has_default:
-                    return True
-        return False
+        definition = self._definitions.get(name)
+        if definition is None:
+            return False
+        if name in self._values:
+            return True
+        return self._allow_defaults and definition.has_default
 
     def add(self, var: Union["VariableDefinition", "VariableValue"]) -> None:
         if isinstance(var, VariableDefinition):
@@ -77,14 +83,15 @@ class VariableStore:
         self._allow_defaults = False
 
     def get(self, name: str, consumer: Any) -> Any:
-        if name in self._definitions:
-            if name in self._values:
-                return self._values[name].value
-            if self._allow_defaults:
-                if self._definitions[name].has_default:
-                    return self._definitions[name].default
-            raise VariableNotPopulatedError(name, consumer)
-        raise VariableNotDefinedError(name, consumer)
+        definition = self._definitions.get(name)
+        if definition is None:
+            raise VariableNotDefinedError(name, consumer)
+        value = self._values.get(name)
+        if value is not None:
+            return value.value
+        if self._allow_defaults and definition.has_default:
+            return definition.default
+        raise VariableNotPopulatedError(name, consumer)
 
     def proxy(self, consumer: Any) -> VariableProxy:
         return VariableProxy(store=self, consumer=consumer)
@@ -219,38 +226,57 @@ class TerraformVariableStore(VariableStore):
         self.disable_defaults()
         self.enable_changes()
 
-        auto_tfvars_files = set()
-        default_tfvars_files = set()
-        tf_files = set()
+        auto_tfvars_files: Set[Path] = set()
+        default_tfvars_files: Set[Path] = set()
+        tf_files: Set[Path] = set()
 
         target_dir = next(iter(self._files_to_create.keys())).parent
 
-        future_files: Set[Path] = set()
-        future_files.update(target_dir.iterdir())
-        future_files.update(self._files_to_create.keys())
-        for path in future_files:
-            name = path.name
-            if name.endswith(".auto.tfvars") or name.endswith(".auto.tfvars.json"):
-                auto_tfvars_files.add(path)
-            elif name in ("terraform.tfvars", "terraform.tfvars.json"):
-                default_tfvars_files.add(path)
-            elif name.endswith(".tf") or name.endswith(".tf.json"):
-                tf_files.add(path)
+        # Find the names of files that exist or will be created, and only
+        # create Path objects for the ones that can contain variables.
+        future_files: Dict[str, Optional[Path]] = dict.fromkeys(os.listdir(target_dir))
+        for path in self._files_to_create:
+            future_files[path.name] = path
+        for name, future_path in future_files.items():
+            if name in DEFAULT_TFVARS_FILE_NAMES:
+                files = default_tfvars_files
+            else:
+                match = VARIABLES_FILE_SUFFIX_RE.search(name)
+                if not match:
+                    continue
+                elif match.group(1) == "auto.tfvars":
+                    files = auto_tfvars_files
+                else:
+                    files = tf_files
+            files.add(future_path or target_dir / name)
 
         # Load variable definitions.
+        definitions_known = True
         for path in tf_files:
             self._source_priority.append(path.name)
             if path in self._files_to_create:
                 self._source_priority.append(self._files_to_create[path].name)
+                definitions_known = False
             else:
                 self._source_priority.append(path.name)
                 for var in get_variables_from_file(path):
                     self.add(var)
 
+        # If no variables are defined, and no files will be created
+        # that could define them, then there is no need to load values.
+        if definitions_known and not self._definitions:
+            self.disable_changes()
+            self.enable_defaults()
+            return
+
         # Load variable values.
         # 1. Environment variables.
+        #    These can be skipped if the variable is not defined,
+        #    unless files will be created that could define it.
         for key, value in os.environ.items():
             if key.startswith("TF_VAR_"):
+                if definitions_known and key[7:] not in self._definitions:
+                    continue
                 self._source_priority.append(key)
                 parsed = parse_environment_variable_for_variables(key, value)
                 for name, value in parsed.items():
@@ -281,26 +307,32 @@ class TerraformVariableStore(VariableStore):
 
         # 5. Any -var and -var-file options on the command line,
         #    in the order they are provided.
-        _, options = util.parse_args()
-        for option in options:
-            if option.startswith("-var="):
+        resolved_files_to_create: Optional[Dict[Path, Path]] = None
+        for option, kind, option_value in util.parse_var_options():
+            if kind == "var":
                 self._source_priority.append(option)
-                var_string = shlex.split(option[5:])[0]
+                var_string = shlex.split(option_value)[0]
                 name, value = var_string.split("=", 1)
                 var = VariableValue(name=name, value=value, source=option)
                 self.add(var)
-            elif option.startswith("-var-file="):
-                var_file = Path(os.path.abspath(option[10:])).resolve()
+            else:
+                var_file = Path(os.path.abspath(option_value)).resolve()
                 # TODO: could be a minor bug with variable priorities when this specifies a file in another
                 # directory and there is a file with the same name in the current directory. Fixing this will
                 # require updating all of the var.source code to allow for full paths, but only printing
                 # the name if there are errors (except when the source is in another directory,
                 # in which case a full path should be displayed).
-                for target_path, source_path in self._files_to_create.items():
-                    if target_path.resolve() == var_file:
-                        self._source_priority.append(source_path.name)
-                        self.tfvars_wait_for(target_path)
-                        break
+                if resolved_files_to_create is None:
+                    # Resolve these once rather than for every -var-file option.
+                    resolved_files_to_create = {
+                        target_path.resolve(): target_path
+                        for target_path in self._files_to_create
+                    }
+                target_path = resolved_files_to_create.get(var_file)
+                if target_path:
+                    source_path = self._files_to_create[target_path]
+                    self._source_priority.append(source_path.name)
+                    self.tfvars_wait_for(target_path)
                 else:
                     self._source_priority.append(var_file.name)
                     for var in get_variables_from_file(var_file):
@@ -312,6 +344,8 @@ class TerraformVariableStore(VariableStore):
 
 
 class VariableDefinition:
+    __slots__ = ("name", "source", "has_default", "default")
+
     def __init__(self, name: str, source: Any, **kwargs: dict) -> None:
         self.name = name
         self.source = str(source)
@@ -333,6 +367,8 @@ class VariableDefinition:
 
 
 class VariableValue:
+    __slots__ = ("name", "value", "source")
+
     def __init__(self, name: str, value: Any, source: Any) -> None:
         self.name = name
         self.value = value
@@ -379,26 +415,51 @@ def get_variable_values_from_block(
         yield VariableValue(name=name, value=value, source=source)
 
 
+# Variables parsed from files, keyed by absolute path,
+# along with the file's mtime and size when it was parsed.
+# Only copies of these are returned, because variable values
+# can be mutable and must not be shared between callers.
+_file_cache: Dict[
+    str, Tuple[int, int, List[Union["VariableDefinition", "VariableValue"]]]
+] = {}
+
+
 def get_variables_from_file(
     path: Path,
 ) -> Generator[Union[VariableDefinition, VariableValue], None, None]:
     try:
-        if path.name.endswith(".tf"):
-            block = parse_hcl2(path.read_text())
-            yield from get_variable_definitions_from_block(block, path.name)
-        elif path.name.endswith(".tfvars"):
-            block = parse_hcl2(path.read_text())
-            yield from get_variable_values_from_block(block, path.name)
-        elif path.name.endswith(".tf.json"):
-            blocks = parse_json_file_for_blocks(path)
-            for block in blocks:
-                yield from get_variable_definitions_from_block(block, path.name)
-        elif path.name.endswith(".tfvars.json"):
-            blocks = parse_json_file_for_blocks(path)
-            for block in blocks:
-                yield from get_variable_values_from_block(block, path.name)
+        # Only parse the file if it has not been parsed
+        # already, or if it has changed since then.
+        stat = path.stat()
+        abs_path = os.path.abspath(path)
+        cached = _file_cache.get(abs_path)
+        if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            variables = cached[2]
         else:
-            raise ValueError(f"Unexpected file extension: {path.name}")
+            variables = list(_parse_variables_from_file(path))
+            _file_cache[abs_path] = (stat.st_mtime_ns, stat.st_size, variables)
     except Exception:
         log.bad(f"Error loading variables from {path}")
         raise
+    yield from copy.deepcopy(variables)
+
+
+def _parse_variables_from_file(
+    path: Path,
+) -> Generator[Union[VariableDefinition, VariableValue], None, None]:
+    if path.name.endswith(".tf"):
+        block = parse_hcl2(path.read_text())
+        yield from get_variable_definitions_from_block(block, path.name)
+    elif path.name.endswith(".tfvars"):
+        block = parse_hcl2(path.read_text())
+        yield from get_variable_values_from_block(block, path.name)
+    elif path.name.endswith(".tf.json"):
+        blocks = parse_json_file_for_blocks(path)
+        for block in blocks:
+            yield from get_variable_definitions_from_block(block, path.name)
+    elif path.name.endswith(".tfvars.json"):
+        blocks = parse_json_file_for_blocks(path)
+        for block in blocks:
+            yield from get_variable_values_from_block(block, path.name)
+    else:
+        raise ValueError(f"Unexpected file extension: {path.name}")
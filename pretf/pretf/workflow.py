@@ -1,8 +1,10 @@
 import inspect
 import json
+import math
 import os
 import shlex
 import sys
+from functools import lru_cache
 from pathlib import Path, PurePath
 from subprocess import CalledProcessError, CompletedProcess
 from typing import Any, Dict, List, Optional, Sequence, Union
@@ -12,6 +14,13 @@ from .exceptions import RequiredFilesNotFoundError
 from .render import call_pretf_function, json_default, render_files
 from .util import import_file, is_verbose
 
+try:
+    import orjson
+
+    use_orjson = True
+except ImportError:
+    use_orjson = False
+
 
 def clean_files(
     paths: Sequence[Path],
@@ -50,6 +59,10 @@ def create_files(
 
     Jinja2 files (*.j2) require the Jinja2 package to be installed.
 
+    JSON files are written faster if the orjson package is installed.
+    It writes non-ASCII characters as UTF-8 instead of escaping them,
+    and also accepts UUID and Enum values, which json does not.
+
     Both target_dir and source_dirs will default to the directory
     specified in the CLI arguments, if specified, otherwise the current
     working directory.
@@ -77,16 +90,17 @@ def create_files(
     for source_dir in source_dirs or ["."]:
         if isinstance(source_dir, str):
             source_dir = Path(source_dir)
-        for source_path in source_dir.iterdir():
-            file_name = source_path.name
-            if (
-                file_name.endswith(".tf.j2")
-                or file_name.endswith(".tf.py")
-                or file_name.endswith(".tfvars.j2")
-                or file_name.endswith(".tfvars.py")
-            ):
-                target_path = (target_dir / file_name).with_suffix(".json")
-                files_to_create[target_path] = source_path
+        with os.scandir(source_dir) as entries:
+            for entry in entries:
+                file_name = entry.name
+                if (
+                    file_name.endswith(".tf.j2")
+                    or file_name.endswith(".tf.py")
+                    or file_name.endswith(".tfvars.j2")
+                    or file_name.endswith(".tfvars.py")
+                ):
+                    target_path = (target_dir / file_name).with_suffix(".json")
+                    files_to_create[target_path] = source_dir / file_name
 
     # Render the JSON data from *.tf.py and *.tfvars.py files.
     if files_to_create:
@@ -98,11 +112,40 @@ def create_files(
         names = [path.name for path in file_contents.keys()]
         log.ok(f"create: {' '.join(sorted(names))}")
 
-    # Write JSON files.
+    # Write JSON files. Remove the contents of each file from the
+    # dict as it is written, so they can be garbage collected.
     created = []
-    for output_path, contents in sorted(file_contents.items()):
-        with output_path.open("w") as open_file:
-            json.dump(contents, open_file, indent=2, default=json_default)
+    for output_path in sorted(file_contents):
+        contents = file_contents.pop(output_path)
+        output_json: Optional[bytes] = None
+        if use_orjson:
+            try:
+                output_json = orjson.dumps(
+                    contents,
+                    default=json_default,
+                    option=(
+                        orjson.OPT_INDENT_2
+                        | orjson.OPT_NON_STR_KEYS
+                        | orjson.OPT_PASSTHROUGH_DATACLASS
+                        | orjson.OPT_PASSTHROUGH_DATETIME
+                    ),
+                )
+            except TypeError:
+                # orjson does not support some values that json does,
+                # such as integers larger than 64 bits, so fall back
+                # to json. It will raise its own error if the contents
+                # really cannot be serialized.
+                pass
+            else:
+                # orjson writes NaN and Infinity as null, so use json
+                # for those to keep the same output.
+                if b"null" in output_json and _has_non_finite_float(contents):
+                    output_json = None
+        if output_json is not None:
+            output_path.write_bytes(output_json)
+        else:
+            with output_path.open("w") as open_file:
+                json.dump(contents, open_file, indent=2, default=json_default)
         created.append(output_path)
 
     return created
@@ -264,27 +307,8 @@ def execute_terraform(
         args = ["teraform"] + list(args)
 
     # Find the Terraform executable in the PATH.
-    for path in os.environ["PATH"].split(os.pathsep):
-
-        if sys.platform == "win32":
-            terraform_path = os.path.join(path, "terraform.exe")
-        else:
-            terraform_path = os.path.join(path, "terraform")
-
-        # Skip if it doesn't exist here.
-        if not os.path.exists(terraform_path):
-            continue
-
-        # Skip if it's not executable.
-        if not os.access(terraform_path, os.X_OK):
-            continue
-
-        # Skip if it's a symlink to Pretf.
-        real_name = os.path.basename(os.path.realpath(terraform_path))
-        if real_name == "pretf":
-            continue
-
-        # This is a valid executable, run it.
+    terraform_path = _find_terraform(os.environ["PATH"])
+    if terraform_path:
         return util.execute(
             file=terraform_path,
             args=args,
@@ -301,6 +325,49 @@ def execute_terraform(
     )
 
 
+def _has_non_finite_float(value: Any) -> bool:
+    if isinstance(value, float):
+        return not math.isfinite(value)
+    if isinstance(value, dict):
+        return any(_has_non_finite_float(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return any(_has_non_finite_float(item) for item in value)
+    return False
+
+
+@lru_cache(maxsize=None)
+def _find_terraform(path_env: str) -> Optional[str]:
+    """
+    Returns the path to the Terraform executable in the PATH,
+    skipping any that are symlinks to Pretf. This is cached
+    because custom workflows can run Terraform multiple times.
+
+    """
+
+    if sys.platform == "win32":
+        name = "terraform.exe"
+    else:
+        name = "terraform"
+
+    for path in path_env.split(os.pathsep):
+
+        terraform_path = os.path.join(path, name)
+
+        # Skip if it doesn't exist here or it's not executable.
+        if not os.access(terraform_path, os.X_OK):
+            continue
+
+        # Skip if it's a symlink to Pretf.
+        real_name = os.path.basename(os.path.realpath(terraform_path))
+        if real_name == "pretf":
+            continue
+
+        # This is a valid executable.
+        return terraform_path
+
+    return None
+
+
 def load_parent(**kwargs: Any) -> CompletedProcess:
     """
     Looks for the closest pretf.workflow.py file in parent directories
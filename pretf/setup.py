@@ -22,6 +22,9 @@ setup(
     packages=["pretf"],
     entry_points={"console_scripts": ("pretf=pretf.cli:main")},
     install_requires=["colorama", "Jinja2", "python-hcl2>=3.0.0"],
-    extras_require={"aws": ["pretf.aws=={}".format(version)]},
+    extras_require={
+        "aws": ["pretf.aws=={}".format(version)],
+        "orjson": ["orjson"],
+    },
     zip_safe=False,
 )
@@ -0,0 +1,225 @@
+import io
+import os
+import signal
+import sys
+import threading
+import time
+from subprocess import CalledProcessError
+
+import pytest
+
+from pretf.util import (
+    _fan_out,
+    execute,
+    find_paths,
+    find_workflow_path,
+    import_file,
+    parse_args,
+    parse_var_options,
+)
+
+
+def test_find_paths(tmp_path):
+    for name in ("a.tf.json", "b.tfvars.json", ".hidden.tf.json", "_c.tf.json"):
+        (tmp_path / name).touch()
+
+    paths = find_paths(
+        path_patterns=["*.tf.json", "*.tfvars.json"],
+        exclude_name_patterns=[".*", "_*"],
+        cwd=tmp_path,
+    )
+    assert sorted(path.name for path in paths) == ["a.tf.json", "b.tfvars.json"]
+
+    paths = find_paths(path_patterns=["*.tf.json"], cwd=str(tmp_path))
+    assert sorted(path.name for path in paths) == [
+        ".hidden.tf.json",
+        "_c.tf.json",
+        "a.tf.json",
+    ]
+
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "d.tf.json").touch()
+    paths = find_paths(path_patterns=["sub/*.tf.json", "**/d.*"], cwd=tmp_path)
+    assert [path.name for path in paths] == ["d.tf.json", "d.tf.json"]
+
+    paths = find_paths(path_patterns=["*"], cwd=tmp_path / "missing")
+    assert list(paths) == []
+
+
+def test_find_workflow_path(tmp_path):
+    child = tmp_path / "a" / "b"
+    child.mkdir(parents=True)
+
+    assert find_workflow_path(cwd=child) is None
+
+    top = tmp_path / "pretf.workflow.py"
+    top.touch()
+    assert find_workflow_path(cwd=child) == top
+
+    # The deprecated name is only used if no pretf.workflow.py exists.
+    middle = tmp_path / "a" / "pretf.py"
+    middle.touch()
+    assert find_workflow_path(cwd=str(child)) == top
+    top.unlink()
+    assert find_workflow_path(cwd=str(child)) == middle
+
+    bottom = child / "pretf.workflow.py"
+    bottom.touch()
+    (child / "pretf.py").touch()
+    assert find_workflow_path(cwd=child) == bottom
+
+
+class SlowRawIO(io.RawIOBase):
+    """
+    Returns a few bytes per read, splitting multi-byte characters.
+
+    """
+
+    def __init__(self, data):
+        self.data = data
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = min(len(buffer), len(self.data), 5)
+        buffer[:size], self.data = self.data[:size], self.data[size:]
+        return size
+
+
+def test_fan_out():
+    text = "résumé ✓\n" * 1000
+    input_stream = io.BufferedReader(SlowRawIO(text.encode()))
+    chunks = []
+    outputs = (io.StringIO(), io.StringIO())
+    _fan_out(input_stream, chunks, *outputs)
+    assert len(chunks) > 1
+    assert "".join(chunks) == text
+    for output in outputs:
+        assert output.getvalue() == text
+
+
+@pytest.mark.parametrize("platform", ["linux", "win32"])
+def test_execute_capture(monkeypatch, platform):
+    # Windows uses threads rather than a selector to read the pipes.
+    monkeypatch.setattr(sys, "platform", platform)
+
+    code = "import sys; print('out ✓' * 100000); print('err', file=sys.stderr)"
+    proc = execute(
+        file=sys.executable,
+        args=["python", "-c", code],
+        capture=True,
+        verbose=False,
+    )
+    assert proc.stdout == "out ✓" * 100000 + "\n"
+    assert proc.stderr == "err\n"
+
+    with pytest.raises(CalledProcessError) as error:
+        execute(
+            file=sys.executable,
+            args=["python", "-c", "print('failed'); exit(2)"],
+            capture=True,
+            verbose=False,
+        )
+    assert error.value.returncode == 2
+    assert error.value.cmd == "python -c 'print('\"'\"'failed'\"'\"'); exit(2)'"
+    assert error.value.output == "failed\n"
+
+
+def test_parse_args(monkeypatch):
+    monkeypatch.setattr(
+        sys,
+        "argv",
+        [
+            "pretf",
+            "plan",
+            "-var",
+            "one=1",
+            "-out",
+            "plan.out",
+            "-var-file=vars.tfvars",
+            "-input=false",
+        ],
+    )
+    assert parse_args() == (
+        "plan",
+        ["-var=one=1", "-out=plan.out", "-var-file=vars.tfvars", "-input=false"],
+    )
+    assert parse_var_options() == (
+        ("-var=one=1", "var", "one=1"),
+        ("-var-file=vars.tfvars", "var-file", "vars.tfvars"),
+    )
+
+    monkeypatch.setattr(sys, "argv", ["pretf", "-help"])
+    assert parse_args() == ("help", [])
+    assert parse_var_options() == ()
+
+
+def test_import_file(tmp_path):
+    (tmp_path / "helper.py").write_text("VALUE = 1\n")
+    path = tmp_path / "main.tf.py"
+    path.write_text("from helper import VALUE\n")
+    pathdir = str(tmp_path)
+
+    with import_file(path) as outer:
+        with import_file(path) as inner:
+            assert inner.VALUE == 1
+        # The directory stays in sys.path until the outer import is done.
+        assert pathdir in sys.path
+        assert outer.VALUE == 1
+    assert pathdir not in sys.path
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="uses POSIX signals")
+def test_execute_capture_keyboard_interrupt():
+    # The subprocess ignores SIGINT and keeps writing output while
+    # this process is repeatedly sent SIGINT. All of the output must
+    # still be captured and KeyboardInterrupt must not escape.
+    code = (
+        "import signal, sys\n"
+        "signal.signal(signal.SIGINT, signal.SIG_IGN)\n"
+        "for i in range(4000):\n"
+        "    sys.stdout.write('x' * 1023 + '\\n')\n"
+    )
+
+    stop = threading.Event()
+
+    def interrupt():
+        while not stop.wait(0.002):
+            os.kill(os.getpid(), signal.SIGINT)
+
+    thread = threading.Thread(target=interrupt)
+    thread.start()
+    try:
+        proc = execute(
+            file=sys.executable,
+            args=["python", "-c", code],
+            capture=True,
+            verbose=False,
+        )
+    finally:
+        stop.set()
+        while thread.is_alive():
+            try:
+                thread.join()
+            except KeyboardInterrupt:
+                pass
+
+    assert proc.stdout == ("x" * 1023 + "\n") * 4000
+
+
+def test_execute_capture_not_found(tmp_path):
+    threads = threading.active_count()
+    with pytest.raises(FileNotFoundError):
+        execute(
+            file=str(tmp_path / "missing"),
+            args=["missing"],
+            capture=True,
+            verbose=False,
+        )
+    # The reader thread stops when the subprocess cannot be started.
+    for _ in range(100):
+        if threading.active_count() == threads:
+            break
+        time.sleep(0.01)
+    assert threading.active_count() == threads
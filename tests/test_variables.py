@@ -3,7 +3,20 @@ from pathlib import Path
 
 import pytest
 
-from pretf.variables import get_variables_from_file
+from pretf import variables
+from pretf.exceptions import (
+    VariableAlreadyDefinedError,
+    VariableNotConsistentError,
+    VariableNotDefinedError,
+    VariableNotPopulatedError,
+)
+from pretf.variables import (
+    TerraformVariableStore,
+    VariableDefinition,
+    VariableStore,
+    VariableValue,
+    get_variables_from_file,
+)
 
 
 def find_test_files():
@@ -27,3 +40,175 @@ def test_get_variables_from_file(test_file_path, expected_file_path):
     for var in get_variables_from_file(test_file_path):
         result.append(dict(var))
     assert expected == result
+
+
+def test_get_variables_from_file_cache(tmp_path, monkeypatch):
+    path = tmp_path / "terraform.tfvars"
+
+    parsed = []
+    parse = variables._parse_variables_from_file
+
+    def counting_parse(path):
+        parsed.append(path)
+        return parse(path)
+
+    monkeypatch.setattr(variables, "_parse_variables_from_file", counting_parse)
+
+    path.write_text('one = "1"\ntags = {\n  a = "1"\n}\n')
+    result = [dict(var) for var in get_variables_from_file(path)]
+    assert result == [
+        {"name": "one", "value": "1", "source": "terraform.tfvars"},
+        {"name": "tags", "value": {"a": "1"}, "source": "terraform.tfvars"},
+    ]
+
+    # Unchanged files are not parsed again.
+    result = list(get_variables_from_file(path))
+    assert len(parsed) == 1
+
+    # Returned values are copies, so changing them does not change the cache.
+    result[1].value["b"] = "2"
+    result = [dict(var) for var in get_variables_from_file(path)]
+    assert result[1]["value"] == {"a": "1"}
+    assert len(parsed) == 1
+
+    # Changed files are parsed again.
+    path.write_text('two = "22"\n')
+    result = [dict(var) for var in get_variables_from_file(path)]
+    assert result == [{"name": "two", "value": "22", "source": "terraform.tfvars"}]
+    assert len(parsed) == 2
+
+
+def test_terraform_variable_store_load(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr("sys.argv", ["pretf", "plan"])
+    monkeypatch.setenv("TF_VAR_one", "1")
+    monkeypatch.setenv("TF_VAR_undefined", "2")
+
+    files_to_create = {
+        tmp_path / "generated.tfvars.json": tmp_path / "generated.tfvars.py"
+    }
+
+    # Values are not loaded when no variables are defined.
+    store = TerraformVariableStore(files_to_create=files_to_create)
+    store.load()
+    assert "one" not in store
+    assert store._source_priority == []
+
+    # Only environment variables for defined variables are loaded.
+    (tmp_path / "variables.tf").write_text('variable "one" {}\n')
+    store = TerraformVariableStore(files_to_create=files_to_create)
+    store.load()
+    assert store.get("one", consumer=None) == 1
+    assert "TF_VAR_one" in store._source_priority
+    assert "TF_VAR_undefined" not in store._source_priority
+
+
+def test_variable_store_errors():
+    store = VariableStore()
+    store.add(VariableDefinition(name="one", source="a.tf"))
+
+    with pytest.raises(VariableAlreadyDefinedError) as already_defined:
+        store.add(VariableDefinition(name="one", source="b.tf"))
+    assert (
+        str(already_defined.value)
+        == "create: b.tf cannot define var.one because a.tf already defined it"
+    )
+
+    with pytest.raises(VariableNotPopulatedError) as not_populated:
+        store.get("one", consumer="c.tf.py")
+    assert (
+        str(not_populated.value)
+        == "create: c.tf.py cannot access var.one because it has no value"
+    )
+
+    with pytest.raises(VariableNotDefinedError) as not_defined:
+        store.get("two", consumer="c.tf.py")
+    assert (
+        str(not_defined.value)
+        == "create: c.tf.py cannot access var.two because it has not been defined"
+    )
+
+    store.add(VariableValue(name="one", value=1, source="a.tfvars"))
+    store.disable_changes()
+    with pytest.raises(VariableNotConsistentError) as not_consistent:
+        store.add(VariableValue(name="one", value=2, source="b.tfvars"))
+    assert (
+        str(not_consistent.value)
+        == "create: b.tfvars cannot set var.one=2 because a.tfvars set var.one=1"
+    )
+
+
+def test_terraform_variable_store_load_var_files(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "variables.tf").write_text('variable "one" {}\nvariable "two" {}\n')
+    (tmp_path / "existing.tfvars").write_text("one = 1\n")
+
+    generated = tmp_path / "generated.tfvars.json"
+    files_to_create = {generated: tmp_path / "generated.tfvars.py"}
+
+    monkeypatch.setattr(
+        "sys.argv",
+        [
+            "pretf",
+            "plan",
+            "-var-file=existing.tfvars",
+            "-var-file",
+            "generated.tfvars.json",
+            "-var=two=2",
+        ],
+    )
+    store = TerraformVariableStore(files_to_create=files_to_create)
+    store.load()
+    assert store.get("one", consumer=None) == 1
+    assert store.get("two", consumer=None) == "2"
+    assert store.tfvars_waiting_for(generated)
+    assert store._source_priority[-3:] == [
+        "existing.tfvars",
+        "generated.tfvars.py",
+        "-var=two=2",
+    ]
+
+
+def test_terraform_variable_store_load_files(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr("sys.argv", ["pretf", "plan"])
+    (tmp_path / "variables.tf.json").write_text(
+        '{"variable": {"one": {}, "two": {}, "three": {"default": 3}}}'
+    )
+    (tmp_path / "terraform.tfvars").write_text("one = 1\ntwo = 1\n")
+    (tmp_path / "b.auto.tfvars.json").write_text('{"two": 2}')
+    (tmp_path / "ignored.tfvars").write_text("one = 0\n")
+    (tmp_path / "ignored.txt").write_text("")
+
+    files_to_create = {tmp_path / "a.auto.tfvars.json": tmp_path / "a.auto.tfvars.py"}
+    store = TerraformVariableStore(files_to_create=files_to_create)
+    store.load()
+    assert store.get("one", consumer=None) == 1
+    assert store.get("two", consumer=None) == 2
+    assert "three" not in store
+    assert store.tfvars_waiting_for(tmp_path / "a.auto.tfvars.json")
+    assert store._source_priority == [
+        "variables.tf.json",
+        "variables.tf.json",
+        "terraform.tfvars",
+        "a.auto.tfvars.py",
+        "b.auto.tfvars.json",
+    ]
+
+
+def test_variable_slots():
+    definition = VariableDefinition(name="one", source="a.tf")
+    assert not definition.has_default
+    assert dict(definition) == {"name": "one", "source": "a.tf"}
+
+    definition = VariableDefinition(name="one", source="a.tf", default=None)
+    assert definition.has_default
+    assert dict(definition) == {"name": "one", "default": None, "source": "a.tf"}
+
+    value = VariableValue(name="one", value=1, source="a.tfvars")
+    assert dict(value) == {"name": "one", "value": 1, "source": "a.tfvars"}
+
+    for var in (definition, value):
+        assert not hasattr(var, "__dict__")
+        with pytest.raises(AttributeError):
+            var.other = True
@@ -0,0 +1,150 @@
+import json
+import os
+from pathlib import Path
+
+import pytest
+
+from pretf import workflow
+from pretf.exceptions import VariableNotPopulatedError
+from pretf.workflow import _find_terraform, create_files
+
+
+def test_find_terraform(tmp_path):
+    shim_dir = tmp_path / "shim"
+    shim_dir.mkdir()
+    (shim_dir / "pretf").touch(mode=0o755)
+    (shim_dir / "terraform").symlink_to(shim_dir / "pretf")
+
+    not_executable_dir = tmp_path / "not-executable"
+    not_executable_dir.mkdir()
+    (not_executable_dir / "terraform").touch(mode=0o644)
+
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    (bin_dir / "terraform").touch(mode=0o755)
+
+    missing_dir = tmp_path / "missing"
+
+    path_env = os.pathsep.join(
+        str(path) for path in (missing_dir, shim_dir, not_executable_dir, bin_dir)
+    )
+    assert _find_terraform(path_env) == str(bin_dir / "terraform")
+
+    path_env = os.pathsep.join(str(path) for path in (missing_dir, shim_dir))
+    assert _find_terraform(path_env) is None
+
+
+@pytest.mark.parametrize(
+    "use_orjson",
+    [
+        False,
+        pytest.param(
+            True,
+            marks=pytest.mark.skipif(
+                not workflow.use_orjson, reason="orjson is not installed"
+            ),
+        ),
+    ],
+)
+def test_create_files(tmp_path, monkeypatch, use_orjson):
+    monkeypatch.setattr(workflow, "use_orjson", use_orjson)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr("sys.argv", ["pretf", "plan"])
+
+    (tmp_path / "variables.tf").write_text('variable "name" {}\n')
+    (tmp_path / "terraform.tfvars.py").write_text(
+        "def pretf_variables():\n    yield {'name': 'example'}\n"
+    )
+    (tmp_path / "outputs.tf.py").write_text(
+        "from pretf.api import block\n"
+        "\n"
+        "def pretf_blocks(var):\n"
+        "    yield block('output', 'name', {'value': var.name})\n"
+    )
+
+    created = create_files(verbose=False)
+    assert created == [Path("outputs.tf.json"), Path("terraform.tfvars.json")]
+
+    assert json.loads((tmp_path / "terraform.tfvars.json").read_text()) == {
+        "name": "example"
+    }
+    assert json.loads((tmp_path / "outputs.tf.json").read_text()) == [
+        {"output": {"name": {"value": "example"}}}
+    ]
+
+
+def test_create_files_single(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr("sys.argv", ["pretf", "plan"])
+
+    (tmp_path / "variables.tf").write_text('variable "name" {}\n')
+    (tmp_path / "outputs.tf.py").write_text(
+        "from pretf.api import block\n"
+        "\n"
+        "def pretf_blocks(var):\n"
+        "    yield block('output', 'name', {'value': var.name})\n"
+    )
+
+    with pytest.raises(VariableNotPopulatedError):
+        create_files(verbose=False)
+
+    monkeypatch.setenv("TF_VAR_name", '"example"')
+    assert create_files(verbose=False) == [Path("outputs.tf.json")]
+    assert json.loads((tmp_path / "outputs.tf.json").read_text()) == [
+        {"output": {"name": {"value": "example"}}}
+    ]
+
+
+@pytest.mark.skipif(not workflow.use_orjson, reason="orjson is not installed")
+def test_create_files_orjson_differences(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr("sys.argv", ["pretf", "plan"])
+
+    def create(use_orjson, values):
+        monkeypatch.setattr(workflow, "use_orjson", use_orjson)
+        (tmp_path / "terraform.tfvars.py").write_text(
+            f"def pretf_variables():\n    yield {values}\n"
+        )
+        create_files(verbose=False)
+        return (tmp_path / "terraform.tfvars.json").read_text(encoding="utf-8")
+
+    # Integers larger than 64 bits fall back to json.
+    values = "{'big': 2 ** 70, 'label': 'ok'}"
+    assert create(True, values) == create(False, values)
+    assert json.loads(create(True, values)) == {"big": 2**70, "label": "ok"}
+
+    # Non-ASCII characters are not escaped by orjson.
+    values = "{'label': 'café'}"
+    assert "caf\\u00e9" in create(False, values)
+    assert "café" in create(True, values)
+    assert json.loads(create(True, values)) == json.loads(create(False, values))
+
+    # NaN is written the same way as json.
+    values = "{'nan': [float('nan')], 'label': None}"
+    assert create(True, values) == create(False, values)
+    assert "NaN" in create(True, values)
+
+    # Datetimes and dataclasses are not supported by either.
+    for values in ("datetime.date(2020, 1, 1)", "Version(1)"):
+        (tmp_path / "terraform.tfvars.py").write_text(
+            "import dataclasses\n"
+            "import datetime\n"
+            "\n"
+            "@dataclasses.dataclass\n"
+            "class Version:\n"
+            "    major: int\n"
+            "\n"
+            f"def pretf_variables():\n    yield {{'value': {values}}}\n"
+        )
+        for use_orjson in (True, False):
+            monkeypatch.setattr(workflow, "use_orjson", use_orjson)
+            with pytest.raises(TypeError):
+                create_files(verbose=False)
+
+    # UUIDs are only supported by orjson.
+    values = "{'id': __import__('uuid').UUID(int=1)}"
+    assert json.loads(create(True, values)) == {
+        "id": "00000000-0000-0000-0000-000000000001"
+    }
+    with pytest.raises(TypeError):
+        create(False, values)